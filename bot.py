@@ -4,19 +4,27 @@ import json
 import logging
 import asyncio
 import time
+from collections import OrderedDict
 import csv
+import signal
+import sys
 from datetime import datetime, timedelta, date
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.cron import CronTrigger
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.ext import (
     ApplicationBuilder,
     CallbackQueryHandler,
+    ApplicationHandlerStop,
     CommandHandler,
     ContextTypes,
     MessageHandler,
+    TypeHandler,
     filters,
 )
-from dataclasses import dataclass
+from dataclasses import dataclass, field, fields
+from functools import lru_cache, partial, wraps
+from typing import Callable, Optional
 
 
 @dataclass
@@ -31,41 +39,116 @@ class Settings:
     bounce_file: str
     bounce_message_file: str
     bounce_csv: str
+    offset_file: str
+    event_log_file: str
     update_interval: float
     scheduler_timezone: str
     meal_poll_hour: int
     meal_poll_minute: int
     meal_poll_day: str
+    admins: dict  # user_id -> role
+    chat_admin_role: Optional[str]  # Rolle für Admins der Gruppe (None = kein Sync)
+
+
+def load_settings():
+    with open(os.getenv("CONFIG_FILE")) as f:
+        config = json.load(f)
+    # optionale, nicht geheime Settings (update_interval, Threads, Owner, ...),
+    # überschreiben CONFIG_FILE und werden beim Reload live neu gelesen
+    settings_file = os.getenv("SETTINGS_FILE")
+    if settings_file and os.path.exists(settings_file):
+        with open(settings_file) as f:
+            config.update(json.load(f))
+
+    new = Settings(
+        telegram_bot_token=config["telegram_bot_token"],
+        chat_id=config["chat_id"],
+        owner_id=config["owner_id"],
+        thread_id_bounceland=config["thread_id_bounceland"],
+        thread_id_meal=config["thread_id_meal"],
+        meal_file=os.environ["MEAL_FILE"],
+        meal_message_file=os.environ["MEAL_MESSAGE_FILE"],
+        bounce_file=os.environ["BOUNCE_FILE"],
+        bounce_message_file=os.environ["BOUNCE_MESSAGE_FILE"],
+        bounce_csv=os.environ["BOUNCE_CSV"],
+        event_log_file=os.getenv("EVENT_LOG_FILE", os.path.join(os.path.dirname(os.environ["BOUNCE_FILE"]), "events.jsonl")),
+        offset_file=os.getenv("OFFSET_FILE", os.path.join(os.path.dirname(os.environ["BOUNCE_FILE"]), "update_offset.json")),
+        update_interval=config["update_interval"],
+        scheduler_timezone=config["scheduler_timezone"],
+        meal_poll_hour=config["meal_poll_hour"],
+        meal_poll_minute=config["meal_poll_minute"],
+        meal_poll_day=config["meal_poll_day"],
+        admins={int(uid): role for uid, role in config.get("admins", {}).items()},
+        chat_admin_role=config.get("chat_admin_role"),
+    )
+    return new
 
 
-with open(os.getenv("CONFIG_FILE")) as f:
-    data = json.load(f)
-
-
-settings = Settings(
-    telegram_bot_token=data["telegram_bot_token"],
-    chat_id=data["chat_id"],
-    owner_id=data["owner_id"],
-    thread_id_bounceland=data["thread_id_bounceland"],
-    thread_id_meal=data["thread_id_meal"],
-    meal_file=os.environ["MEAL_FILE"],
-    meal_message_file=os.environ["MEAL_MESSAGE_FILE"],
-    bounce_file=os.environ["BOUNCE_FILE"],
-    bounce_message_file=os.environ["BOUNCE_MESSAGE_FILE"],
-    bounce_csv=os.environ["BOUNCE_CSV"],
-    update_interval=data["update_interval"],
-    scheduler_timezone=data["scheduler_timezone"],
-    meal_poll_hour=data["meal_poll_hour"],
-    meal_poll_minute=data["meal_poll_minute"],
-    meal_poll_day=data["meal_poll_day"],
-)
+def _is_id(value):
+    return isinstance(value, int) or (isinstance(value, str) and value.lstrip("-").isdigit())
+
+
+def validate_settings(s):
+    """
+    Wirft ValueError, wenn die Config nicht benutzbar ist. Nur beim Reload,
+    damit ein Start mit einer bisher funktionierenden Config nie scheitert.
+    """
+    if not (_is_id(s.chat_id) or (isinstance(s.chat_id, str) and s.chat_id.startswith("@"))):
+        raise ValueError("chat_id must be a chat id or @username")
+    # None = General-Thread
+    for name in ("owner_id", "thread_id_bounceland", "thread_id_meal"):
+        value = getattr(s, name)
+        if value is not None and not _is_id(value):
+            raise ValueError(f"{name} must be an integer or null")
+    if not isinstance(s.update_interval, (int, float)) or s.update_interval < 0:
+        raise ValueError("update_interval must be a number >= 0")
+    for role in list(s.admins.values()) + ([s.chat_admin_role] if s.chat_admin_role else []):
+        if role not in ROLE_LEVELS:
+            raise ValueError(f"unknown role {role!r}, expected one of {', '.join(ROLE_LEVELS)}")
+    # prüft day_of_week, hour, minute und timezone
+    CronTrigger(day_of_week=s.meal_poll_day, hour=s.meal_poll_hour, minute=s.meal_poll_minute, timezone=s.scheduler_timezone)
+
+
+# Rollen, höhere Stufe darf alles der niedrigeren
+ROLE_LEVELS = {"poster": 1, "admin": 2, "owner": 3}
+
+settings = load_settings()
 
 
-LAST_UPDATE_TIME = 0
+LAST_UPDATE_ID = 0
+SEEN_CALLBACKS = OrderedDict()  # callback_query.id -> None (LRU)
+LAST_TAPS = OrderedDict()  # (user_id, callback_data) -> monotonic time
 
 # Optionen
 MODES = ["Van", "Car", "Tent", "Hammock", "In someone elses", "Other"]
 WEEK_CHOICES = [("Full week", 1.0), ("Half week", 0.5)]
+WEEKS_PER_PAGE = 8
+
+# Event Log
+EVENT_LOG_MAX_BYTES = 5 * 1024 * 1024
+EVENT_LOG_BACKUPS = 5
+EVENT_LOG_FLUSH_INTERVAL = 2.0
+
+# Permissions
+CHAT_ADMIN_TTL = 600
+CHAT_ADMIN_RETRY = 60
+
+# Load Shedding (Hysterese: an bei HIGH, aus bei LOW)
+SHED_QUEUE_HIGH = 50
+SHED_QUEUE_LOW = 5
+SHED_LATENCY_HIGH = 1.0
+SHED_LATENCY_LOW = 0.3
+SHED_LATENCY_ALPHA = 0.2
+SHED_REFRESH_INTERVAL = 10.0
+SHED_CHECK_INTERVAL = 2.0
+SHED_LATENCY_HALF_LIFE = 5.0  # Latenz-EMA halbiert sich ohne neue Messungen
+
+# Update Offset: nur so weit zurück gilt ein Update als schon verarbeitet
+UPDATE_ID_WINDOW = 100
+
+# Callback-Deduplizierung
+CALLBACK_SEEN_MAX = 1024
+CALLBACK_DEBOUNCE_SECONDS = 1.0
 
 # Logging
 logging.basicConfig(format="%(asctime)s - %(levelname)s - %(message)s", level=logging.INFO)
@@ -91,8 +174,111 @@ def load_json(path):
 
 
 def save_json(path, data):
-    with open(path, "w", encoding="utf-8") as f:
+    # erst in Temp-Datei schreiben, dann atomar ersetzen -> kein halbes JSON bei Abbruch
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
         json.dump(data, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+# -----------------------------
+# Event Log (JSON-Lines, gepuffert, mit Rotation)
+# -----------------------------
+class EventLog:
+    """
+    Jede Stimmabgabe (MEAL/MODE/WEEK) wird als eine JSON-Zeile mit
+    Zeitstempel, uid und before/after geloggt. record() hängt nur an den
+    Puffer an, geschrieben wird gesammelt in flush() (im Thread).
+    Jede neue Datei beginnt mit einem CHECKPOINT (kompletter State aus
+    checkpoint()), damit Replay auch nach Rotation einen Startpunkt hat.
+    """
+
+    def __init__(self, path, checkpoint, max_bytes=EVENT_LOG_MAX_BYTES, backups=EVENT_LOG_BACKUPS):
+        self.path = path
+        self.checkpoint = checkpoint
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._buffer = []
+        self._lock = asyncio.Lock()
+        self._stop = asyncio.Event()
+
+    def _line(self, type_, uid, key, before, after, **extra):
+        event = {"ts": round(time.time(), 3), "type": type_, "uid": uid, "key": key, "before": before, "after": after}
+        event.update(extra)
+        return json.dumps(event, ensure_ascii=False, separators=(",", ":"))
+
+    def record(self, type_, uid, key, before, after, **extra):
+        self._buffer.append(self._line(type_, uid, key, before, after, **extra))
+
+    def record_checkpoint(self):
+        self._buffer.append(self._line("CHECKPOINT", None, None, None, self.checkpoint()))
+
+    async def flush(self):
+        if not self._buffer:
+            return
+        lines, self._buffer = self._buffer, []
+        async with self._lock:
+            size = sum(len(line.encode("utf-8")) + 1 for line in lines)
+            exists = os.path.exists(self.path)
+            rotate = exists and os.path.getsize(self.path) + size > self.max_bytes
+            # Checkpoint hier im Event-Loop bauen, damit der State konsistent ist.
+            # Er enthält die gepufferten Events schon, Replay setzt aber nur
+            # after-Werte, das erneute Anwenden ist also harmlos.
+            head = [self._line("CHECKPOINT", None, None, None, self.checkpoint())] if rotate or not exists else []
+            try:
+                await asyncio.to_thread(self._write, head + lines, rotate)
+            except Exception:
+                # nichts verlieren, beim nächsten flush nochmal versuchen
+                self._buffer[:0] = lines
+                raise
+
+    async def run(self, interval=EVENT_LOG_FLUSH_INTERVAL):
+        while not self._stop.is_set():
+            try:
+                await asyncio.wait_for(self._stop.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+            except Exception as e:
+                logging.warning("Event log flush failed: %s", e)
+
+    def stop(self):
+        """run() beendet sich nach einem letzten flush, ohne einen laufenden Write abzubrechen."""
+        self._stop.set()
+
+    def _write(self, lines, rotate):
+        payload = ("\n".join(lines) + "\n").encode("utf-8")
+        if rotate:
+            self._rotate()
+        with open(self.path, "ab") as f:
+            f.write(payload)
+
+    def _rotate(self):
+        # events.jsonl -> events.jsonl.1 -> ... -> events.jsonl.N (älteste fällt weg)
+        for i in range(self.backups - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+
+def event_log_files(path):
+    """Alle Log-Dateien inkl. Rotation, älteste zuerst."""
+    rotated = []
+    i = 1
+    while os.path.exists(f"{path}.{i}"):
+        rotated.append(f"{path}.{i}")
+        i += 1
+    files = list(reversed(rotated))
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+
+event_log = EventLog(settings.event_log_file, checkpoint=lambda: poll_checkpoint())
 
 
 # -----------------------------
@@ -165,10 +351,12 @@ def month_week_label(dt: date):
 # -----------------------------
 # Anzeige-Hilfen (Balken & Farben)
 # -----------------------------
-def symbol_color_for_cumulative(cumulative):
-    if cumulative <= 30:
+def color_for(value, thresholds):
+    """thresholds = (grün bis, orange bis), alles darüber ist rot."""
+    green_max, orange_max = thresholds
+    if value <= green_max:
         return "green"
-    if cumulative <= 50:
+    if value <= orange_max:
         return "orange"
     return "red"
 
@@ -189,7 +377,7 @@ def circle_for_rest(color):
     return "🔴"
 
 
-def build_visual_bar(count):
+def build_visual_bar(count, thresholds):
     """
     Visualisierung:
     - 1 Viereck (🟩/🟧/🟥) = 10 Personen
@@ -212,7 +400,7 @@ def build_visual_bar(count):
     cumulative = 0
     for v in values:
         cumulative += v
-        color = symbol_color_for_cumulative(cumulative)
+        color = color_for(cumulative, thresholds)
         if v == 10:
             symbols.append(block_for_ten(color))
         elif v == 5:
@@ -222,117 +410,352 @@ def build_visual_bar(count):
 
 
 # -----------------------------
-# Meal Poll
+# Load Shedding
 # -----------------------------
-def get_days_with_dates_meal():
-    today = datetime.now()
-    monday = today - timedelta(days=today.weekday())
-    days = []
-    for i in range(7):
-        d = monday + timedelta(days=i + 7)
-        days.append((d.strftime("%A"), d.strftime("%d.%m.%Y")))
-    return days
+class AdmissionController:
+    """
+    Beobachtet Queue-Tiefe und Handler-Latenz (EMA). Unter Last wird in den
+    degraded mode geschaltet: sofort antworten, Stimme speichern, aber statt
+    Edit pro Klick nur alle SHED_REFRESH_INTERVAL Sekunden neu zeichnen.
+    Gemessen wird die ganze Handlerzeit inklusive query.answer, weil gerade
+    der Telegram-Roundtrip unter Last wächst. run() prüft auch ohne neue Klicks
+    regelmäßig, damit der degraded mode nach dem Sturm wieder endet.
+    """
 
+    def __init__(self):
+        self.latency = 0.0
+        self.degraded = False
+        self.shed = 0
+        self._since = 0.0
+        self._last_sample = time.monotonic()
+
+    def _decay(self):
+        now = time.monotonic()
+        self.latency *= 0.5 ** ((now - self._last_sample) / SHED_LATENCY_HALF_LIFE)
+        self._last_sample = now
+
+    def check(self, queue_depth):
+        self._decay()
+        if not self.degraded and (queue_depth >= SHED_QUEUE_HIGH or self.latency >= SHED_LATENCY_HIGH):
+            self.degraded = True
+            self.shed = 0
+            self._since = time.monotonic()
+            logging.warning(
+                "⚠️ Callback storm (queue %s, latency %.2fs): degraded mode on, refreshing every %ss",
+                queue_depth, self.latency, render_interval(),
+            )
+        elif self.degraded and queue_depth <= SHED_QUEUE_LOW and self.latency <= SHED_LATENCY_LOW:
+            self.degraded = False
+            logging.warning(
+                "✅ Degraded mode off after %.0fs, %s re-renders shed",
+                time.monotonic() - self._since, self.shed,
+            )
 
-def get_color_icon(count):
-    if count <= 25:
-        return "🟩"
-    if count <= 50:
-        return "🟧"
-    return "🟥"
+    def record(self, seconds):
+        self._decay()
+        self.latency = SHED_LATENCY_ALPHA * seconds + (1 - SHED_LATENCY_ALPHA) * self.latency
 
+    async def run(self, app):
+        while True:
+            await asyncio.sleep(SHED_CHECK_INTERVAL)
+            self.check(app.update_queue.qsize())
 
-def format_meal_text(polls):
-    text = "🍽 *Weekly Meal Participation*\n\n"
-    for day, users in polls.items():
-        count = len(users)
-        icon = get_color_icon(count)
-        user_list = "\n".join([f"- {u}" for u in users]) if users else "–"
-        text += f"{icon} *{day}* — {count}\n{user_list}\n\n"
-    return text
 
+admission = AdmissionController()
 
-def build_meal_keyboard(polls=None, current_user=None):
-    days_with_dates = get_days_with_dates_meal()
-    buttons = []
-    for day_name, date_str in days_with_dates:
-        label = f"{day_name} ({date_str})"
-        if polls and current_user and current_user in polls.get(day_name, []):
-            label = f"✅ {label}"
-        else:
-            label = f"⬜ {label}"
-        buttons.append([InlineKeyboardButton(label, callback_data=f"MEAL|{day_name}")])
-    return InlineKeyboardMarkup(buttons)
 
+# -----------------------------
+# Poll Engine
+# -----------------------------
+@dataclass
+class PollDef:
+    """
+    Deklarative Beschreibung einer Umfrage. Speichern, Rendern, Drosseln
+    und Callback-Dispatch laufen für alle Polls über denselben Pfad.
+    """
+    key: str
+    prefix: str  # Callback-/Event-Prefix, z.B. "MEAL"
+    title: str
+    state_setting: str  # Settings-Feld mit Pfad zur State-Datei
+    message_setting: str  # Settings-Feld mit Pfad zur Message-ID-Datei
+    thread_setting: str  # Settings-Feld mit Thread-ID
+    init_state: Callable[[], dict]
+    format_text: Callable
+    build_keyboard: Callable  # (poll, data, current_user, page) -> InlineKeyboardMarkup
+    actions: dict  # Callback-Prefix -> action(poll, data, query, arg) -> Antworttext
+    thresholds: tuple = (30, 50)
+    weights: Optional[dict] = None  # Option/Choice -> Gewicht pro Stimme (None = jede Stimme zählt 1)
+    options: Optional[Callable[[], list]] = None  # () -> [(key, label)] für Toggle-Polls
+    voter: Callable = lambda query: str(query.from_user.id)  # wie ein User im State gespeichert wird
+    page_size: int = 0
+    page_keys: Optional[Callable[[dict], list]] = None  # data -> Einträge, über die geblättert wird
+    schedule: Optional[Callable[[], dict]] = None  # () -> cron kwargs
+    reset_on_post: bool = False
+    # Laufzeit-Zustand
+    page: int = field(default=0, init=False)
+    last_render: float = field(default=0.0, init=False)
+    render_pending: bool = field(default=False, init=False)
+    render_user: Optional[str] = field(default=None, init=False)
+
+    def score(self, groups):
+        """groups = {option/choice: [voter, ...]} -> gewichtete Summe der Stimmen."""
+        if self.weights is None:
+            return sum(len(voters) for voters in groups.values())
+        return sum(len(voters) * self.weights.get(choice, 0) for choice, voters in groups.items())
+
+    @property
+    def state_file(self):
+        return getattr(settings, self.state_setting)
+
+    @property
+    def message_file(self):
+        return getattr(settings, self.message_setting)
+
+    @property
+    def thread_id(self):
+        return getattr(settings, self.thread_setting)
+
+
+POLLS = {}
+CALLBACK_HANDLERS = {}
+STATE_CACHE = {}  # path -> ((mtime_ns, size), data)
+
+
+def register_poll(poll):
+    POLLS[poll.key] = poll
+    for prefix, action in poll.actions.items():
+        CALLBACK_HANDLERS[prefix] = partial(handle_poll_action, poll, action)
+    return poll
+
+
+def load_state(path):
+    """
+    load_json mit Cache: solange Datei unverändert (mtime/size), wird nicht
+    neu geparst. Schreiben von außen (Import, Reset) invalidiert automatisch.
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return {}
+    sig = (st.st_mtime_ns, st.st_size)
+    cached = STATE_CACHE.get(path)
+    if cached and cached[0] == sig:
+        return cached[1]
+    data = load_json(path)
+    STATE_CACHE[path] = (sig, data)
+    return data
 
-async def handle_meal_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    global LAST_UPDATE_TIME
-    query = update.callback_query
-    user = query.from_user.first_name
-    day = query.data.split("|", 1)[1]
 
-    data = load_json(settings.meal_file)
-    polls = data.get("polls", {})
+def save_state(path, data):
+    save_json(path, data)
+    st = os.stat(path)
+    STATE_CACHE[path] = ((st.st_mtime_ns, st.st_size), data)
 
-    if day not in polls:
-        polls[day] = []
 
-    if user in polls[day]:
-        polls[day].remove(user)
-    else:
-        polls[day].append(user)
+def load_poll_state(poll):
+    return load_state(poll.state_file) or poll.init_state()
+
 
-    data["polls"] = polls
-    save_json(settings.meal_file, data)
-    await query.answer("✅ Updated!")
+async def render_poll(poll, bot):
+    """Globale Nachricht mit aktuellem State neu zeichnen."""
+    msg_id = load_state(poll.message_file).get("message_id")
+    if not msg_id:
+        return
+    data = load_poll_state(poll)
+    try:
+        await bot.edit_message_text(
+            chat_id=settings.chat_id,
+            message_id=msg_id,
+            text=poll.format_text(poll, data),
+            reply_markup=poll.build_keyboard(poll, data, poll.render_user, poll.page),
+            parse_mode="Markdown",
+        )
+    except Exception as e:
+        logging.warning("%s global edit failed: %s", poll.key, e)
 
-    text = format_meal_text(polls)
-    now = time.time()
 
-    if now - LAST_UPDATE_TIME > settings.update_interval:
-        LAST_UPDATE_TIME = now
-        msg_id = load_json(settings.meal_message_file).get("message_id")
-        if msg_id:
-            try:
-                await context.bot.edit_message_text(
-                    chat_id=settings.chat_id,
-                    message_id=msg_id,
-                    text=text,
-                    reply_markup=build_meal_keyboard(polls),
-                    parse_mode="Markdown"
-                )
-            except Exception as e:
-                logging.warning(f"Meal global edit failed: {e}")
+def render_interval():
+    # unter Last nie öfter als SHED_REFRESH_INTERVAL, aber auch nie öfter als normal
+    if admission.degraded:
+        return max(settings.update_interval, SHED_REFRESH_INTERVAL)
+    return settings.update_interval
+
+
+async def _render_later(poll, bot):
+    # Intervall bei jedem Aufwachen neu bestimmen: schaltet der degraded mode
+    # während des Wartens ein, wird ein schon geplanter Edit nach hinten geschoben.
+    while True:
+        delay = poll.last_render + render_interval() - time.monotonic()
+        if delay <= 0:
+            break
+        await asyncio.sleep(delay)
+    poll.render_pending = False
+    poll.last_render = time.monotonic()
+    await render_poll(poll, bot)
+
+
+def request_render(poll, context, current_user):
+    """
+    Gedrosseltes Neuzeichnen: höchstens ein Edit pro render_interval(), der
+    letzte Stand wird immer noch gezeichnet (Trailing Edit).
+    """
+    poll.render_user = current_user
+    if poll.render_pending:
+        if admission.degraded:
+            admission.shed += 1
+        return
+    poll.render_pending = True
+    context.application.create_task(_render_later(poll, context.bot))
+
+
+async def handle_poll_action(poll, action, update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    arg = query.data.split("|", 1)[1]
 
     try:
-        await query.edit_message_text(
-            text=text,
-            reply_markup=build_meal_keyboard(polls, current_user=user),
-            parse_mode="Markdown"
-        )
+        data = load_poll_state(poll)
+        answer = action(poll, data, query, arg)
+        save_state(poll.state_file, data)
     except Exception:
-        pass
+        logging.exception("Saving vote for %s failed", poll.key)
+        await query.answer("❌ Vote could not be saved, please try again")
+        return
 
+    if admission.degraded:
+        answer = "✅ Saved, overview refreshes shortly"
+    await query.answer(answer)
 
-async def post_weekly_meal(app):
-    days_with_dates = get_days_with_dates_meal()
-    polls = {day: [] for day, _ in days_with_dates}
+    request_render(poll, context, poll.voter(query))
 
-    save_json(settings.meal_file, {"polls": polls})
 
-    text = format_meal_text(polls)
+async def handle_poll_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    try:
+        _, key, page = query.data.split("|", 2)
+        poll = POLLS[key]
+        page = int(page)
+    except (KeyError, ValueError):
+        await query.answer()
+        return
+
+    data = load_poll_state(poll)
+    page = min(max(page, 0), page_count(poll, data) - 1)
+    await query.answer()
+    if page == poll.page:
+        return
+    poll.page = page
+
+    # Nur das Keyboard austauschen, der Text bleibt gleich
+    try:
+        await query.edit_message_reply_markup(
+            reply_markup=poll.build_keyboard(poll, data, poll.voter(query), poll.page),
+        )
+    except Exception as e:
+        logging.warning("%s page switch failed: %s", poll.key, e)
+
+
+async def post_poll(poll, app):
+    poll.page = 0
+    if poll.reset_on_post:
+        data = poll.init_state()
+        save_state(poll.state_file, data)
+        event_log.record(f"{poll.prefix}_NEW", None, None, None, list(data.get("polls", {})))
+    else:
+        data = load_state(poll.state_file)
+        if not data:
+            data = poll.init_state()
+            save_state(poll.state_file, data)
 
     msg = await app.bot.send_message(
         chat_id=settings.chat_id,
-        message_thread_id=settings.thread_id_meal,
-        text=text,
-        reply_markup=build_meal_keyboard({"polls": polls}),
+        message_thread_id=poll.thread_id,
+        text=poll.format_text(poll, data),
+        reply_markup=poll.build_keyboard(poll, data, None, poll.page),
         parse_mode="Markdown"
     )
+    save_state(poll.message_file, {"message_id": msg.message_id})
+    poll.last_render = time.monotonic()
+    logging.info("%s poll posted (id %s)", poll.key, msg.message_id)
+
+
+def page_count(poll, data):
+    if not poll.page_size:
+        return 1
+    return max(1, -(-len(poll.page_keys(data)) // poll.page_size))
 
-    logging.info(f"📅 Meal poll posted: {msg.message_id}")
-    save_json(settings.meal_message_file, {"message_id": msg.message_id})
-    logging.info(f"Meal poll posted (id {msg.message_id})")
+
+def nav_row(poll_key, page, pages):
+    """Navigation: ◀️ [Seite x/y] ▶️"""
+    nav = []
+    if page > 0:
+        nav.append(InlineKeyboardButton("◀️", callback_data=f"PAGE|{poll_key}|{page - 1}"))
+    nav.append(InlineKeyboardButton(f"{page + 1}/{pages}", callback_data=f"PAGE|{poll_key}|{page}"))
+    if page < pages - 1:
+        nav.append(InlineKeyboardButton("▶️", callback_data=f"PAGE|{poll_key}|{page + 1}"))
+    return nav
+
+
+# -----------------------------
+# Toggle Polls (ein Button pro Option, z.B. Meal)
+# -----------------------------
+def apply_toggle_vote(polls, user, option, selected):
+    voters = polls.setdefault(option, [])
+    if selected and user not in voters:
+        voters.append(user)
+    elif not selected and user in voters:
+        voters.remove(user)
+
+
+def init_toggle_state(poll):
+    return {"polls": {key: [] for key, _ in poll.options()}}
+
+
+def format_toggle_text(poll, data):
+    text = f"{poll.title}\n\n"
+    for option, users in data.get("polls", {}).items():
+        score = poll.score({option: users})
+        icon = block_for_ten(color_for(score, poll.thresholds))
+        user_list = "\n".join([f"- {u}" for u in users]) if users else "–"
+        text += f"{icon} *{option}* — {score:g}\n{user_list}\n\n"
+    return text
+
+
+def build_toggle_keyboard(poll, data=None, current_user=None, page=0):
+    polls = data.get("polls", {}) if data else {}
+    buttons = []
+    for key, label in poll.options():
+        if current_user and current_user in polls.get(key, []):
+            label = f"✅ {label}"
+        else:
+            label = f"⬜ {label}"
+        buttons.append([InlineKeyboardButton(label, callback_data=f"{poll.prefix}|{key}")])
+    return InlineKeyboardMarkup(buttons)
+
+
+def toggle_action(poll, data, query, option):
+    user = poll.voter(query)
+    polls = data.setdefault("polls", {})
+    before = user in polls.get(option, [])
+    apply_toggle_vote(polls, user, option, not before)
+    event_log.record(poll.prefix, query.from_user.id, option, before, not before, name=user)
+    return "✅ Updated!"
+
+
+# -----------------------------
+# Meal Poll
+# -----------------------------
+def get_days_with_dates_meal():
+    today = datetime.now()
+    monday = today - timedelta(days=today.weekday())
+    days = []
+    for i in range(7):
+        d = monday + timedelta(days=i + 7)
+        days.append((d.strftime("%A"), d.strftime("%d.%m.%Y")))
+    return days
+
+
+def meal_options():
+    return [(day_name, f"{day_name} ({date_str})") for day_name, date_str in get_days_with_dates_meal()]
 
 
 # -----------------------------
@@ -347,127 +770,98 @@ def init_bounceland_structure():
     return data
 
 
-def format_bounceland_text(data):
+def format_bounceland_text(poll, data):
     """
     Weekly Summary: Date + visual bar + integer score
     """
-    text = "*Bounceland Weekly Summary*\n\n"
+    text = f"{poll.title}\n\n"
     for wk_iso in sorted(data.get("weeks", {}).keys()):
-        groups = data["weeks"][wk_iso]
-        full = len(groups.get("Full week", []))
-        half = len(groups.get("Half week", []))
-        score = full * 1.0 + half * 0.5
-        bar = build_visual_bar(int(round(score))) if score >= 1 else build_visual_bar(int(round(score)))
+        score = poll.score(data["weeks"][wk_iso])
+        bar = build_visual_bar(int(round(score)), poll.thresholds)
         label = fmt_week_label_iso(datetime.fromisoformat(wk_iso).date())
         text += f"{label} {bar} {int(score)}\n"
     return text
 
 
-def build_bounceland_keyboard(data=None, current_user=None):
+def _bounceland_week_keys(data=None):
+    return sorted(data.get("weeks", {}).keys()) if data else [w.isoformat() for w in get_week_dates_nov_apr()]
+
+
+def bounceland_page_for_week(poll, data, wk_iso):
+    weeks = _bounceland_week_keys(data)
+    if wk_iso not in weeks:
+        return 0
+    return weeks.index(wk_iso) // poll.page_size
+
+
+@lru_cache(maxsize=256)
+def _render_bounceland_page(poll_key, modes_selected, page_weeks, page, pages, thresholds):
     """
-    Keyboard:
-    - Jede Mode in eigener Zeile.
-    - Für jede Woche: eine Zeile mit [emoji MonthWeek] [Full] [Half] [Not]
-      - Emoji = indicator basierend auf total score
-      - MonthWeek = e.g. Nov1, Nov2, Dec1 ...
+    Baut das Keyboard für eine Seite. Alle Argumente sind hashbar, damit
+    identische Seiten (gleiche Scores, gleiche Auswahl) aus dem Cache kommen.
+    page_weeks = ((wk_iso, score, gewählte choice oder None), ...)
     """
     kb = []
 
     # Modes — jeweils eigene Zeile
     for mode in MODES:
-        label = mode
-        if data and current_user:
-            user_info = data.get("users", {}).get(current_user, {})
-            if mode in user_info.get("modes", []):
-                label = f"✅ {mode}"
+        label = f"✅ {mode}" if mode in modes_selected else mode
         kb.append([InlineKeyboardButton(label, callback_data=f"MODE|{mode}")])
 
-    # Weeks: show as MonthIndex (Nov1, Dec1, ...) with emoji indicator
-    weeks = list(data.get("weeks", {}).keys()) if data else [w.isoformat() for w in get_week_dates_nov_apr()]
-    for wk_iso in weeks:
-        wk_date = datetime.fromisoformat(wk_iso).date()
-        groups = data.get("weeks", {}).get(wk_iso, {"Full week": [], "Half week": [], "Not really": []}) if data else {"Full week": [], "Half week": [], "Not really": []}
-        full = len(groups.get("Full week", []))
-        half = len(groups.get("Half week", []))
-        score = full * 1.0 + half * 0.5
-
-        if score <= 30:
-            emoji = "🟢"
-        elif score <= 50:
-            emoji = "🟠"
-        else:
-            emoji = "🔴"
-
-        label_week = month_week_label(wk_date)  # e.g. "Nov1"
+    for wk_iso, score, selected in page_weeks:
+        emoji = circle_for_rest(color_for(score, thresholds))
+        label_week = month_week_label(datetime.fromisoformat(wk_iso).date())  # e.g. "Nov1"
         row = []
         for choice_key, _ in WEEK_CHOICES:
             short = choice_key.split()[0]  # Full / Half / Not
-            btn_label = short
-            if data and current_user:
-                user_weeks = data.get("users", {}).get(current_user, {}).get("weeks", {})
-                if user_weeks.get(wk_iso) == choice_key:
-                    btn_label = f"✅ {short}"
+            btn_label = f"✅ {short}" if selected == choice_key else short
             row.append(InlineKeyboardButton(btn_label, callback_data=f"WEEK|{wk_iso}|{choice_key}"))
         # leftmost button shows emoji + monthWeek; INFO callback so it doesn't interfere
         kb.append([InlineKeyboardButton(f"{emoji} {label_week}", callback_data=f"INFO|{wk_iso}")] + row)
 
-    return InlineKeyboardMarkup(kb)
-
+    if pages > 1:
+        kb.append(nav_row(poll_key, page, pages))
 
-# -----------------------------
-# Handlers for Bounceland & Meal
-# -----------------------------
-async def handle_bounceland_mode(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    query = update.callback_query
-    # use unique id as key if possible
-    uid = str(query.from_user.id)
-    name = query.from_user.first_name or ""
-    username = f"@{query.from_user.username}" if query.from_user.username else ""
-    mode = query.data.split("|", 1)[1]
+    return InlineKeyboardMarkup(kb)
 
-    data = load_json(settings.bounce_file)
-    if not data:
-        data = init_bounceland_structure()
 
-    users = data.setdefault("users", {})
-    user_info = users.setdefault(uid, {"name": name, "username": username, "modes": [], "weeks": {}})
+def build_bounceland_keyboard(poll, data=None, current_user=None, page=0):
+    """
+    Keyboard:
+    - Jede Mode in eigener Zeile.
+    - Für jede Woche der aktuellen Seite: eine Zeile mit [emoji MonthWeek] [Full] [Half]
+      - Emoji = indicator basierend auf total score
+      - MonthWeek = e.g. Nov1, Nov2, Dec1 ...
+    - Letzte Zeile: Blättern (PAGE|bounceland|n), nur page_size Wochen pro Edit.
+    """
+    weeks = _bounceland_week_keys(data)
+    pages = page_count(poll, data)
+    page = min(max(page, 0), pages - 1)
 
-    if mode in user_info["modes"]:
-        user_info["modes"].remove(mode)
-        await query.answer(f"❌ {mode} removed")
-    else:
-        user_info["modes"].append(mode)
-        await query.answer(f"✅ {mode} added")
+    user_info = data.get("users", {}).get(current_user, {}) if data and current_user else {}
+    user_weeks = user_info.get("weeks", {})
 
-    save_json(settings.bounce_file, data)
+    page_weeks = []
+    for wk_iso in weeks[page * poll.page_size:(page + 1) * poll.page_size]:
+        groups = data.get("weeks", {}).get(wk_iso, {}) if data else {}
+        page_weeks.append((wk_iso, poll.score(groups), user_weeks.get(wk_iso)))
 
-    # Update global message if exists
-    msg_id = load_json(settings.bounce_message_file).get("message_id")
-    text = format_bounceland_text(data)
-    try:
-        if msg_id:
-            await context.bot.edit_message_text(
-                chat_id=settings.chat_id,
-                message_id=msg_id,
-                text=text,
-                reply_markup=build_bounceland_keyboard(data, current_user=uid),
-                parse_mode="Markdown",
-            )
-    except Exception as e:
-        logging.warning(f"Bounceland edit failed: {e}")
+    return _render_bounceland_page(
+        poll.key, tuple(user_info.get("modes", [])), tuple(page_weeks), page, pages, poll.thresholds
+    )
 
 
-async def handle_bounceland_week(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    query = update.callback_query
-    uid = str(query.from_user.id)
-    name = query.from_user.first_name or ""
-    username = f"@{query.from_user.username}" if query.from_user.username else ""
-    _, wk_iso, choice_key = query.data.split("|", 2)
+def apply_bounceland_mode(data, uid, name, username, mode, selected):
+    users = data.setdefault("users", {})
+    user_info = users.setdefault(uid, {"name": name, "username": username, "modes": [], "weeks": {}})
+    if selected and mode not in user_info["modes"]:
+        user_info["modes"].append(mode)
+    elif not selected and mode in user_info["modes"]:
+        user_info["modes"].remove(mode)
 
-    data = load_json(settings.bounce_file)
-    if not data:
-        data = init_bounceland_structure()
 
+def apply_bounceland_week(data, uid, name, username, wk_iso, choice_key):
+    """Setzt die Auswahl von uid für wk_iso (choice_key=None entfernt sie)."""
     users = data.setdefault("users", {})
     if uid not in users:
         users[uid] = {"name": name, "username": username, "modes": [], "weeks": {}}
@@ -476,32 +870,40 @@ async def handle_bounceland_week(update: Update, context: ContextTypes.DEFAULT_T
     if prev_choice and uid in data["weeks"].get(wk_iso, {}).get(prev_choice, []):
         data["weeks"][wk_iso][prev_choice].remove(uid)
 
-    if prev_choice == choice_key:
+    if choice_key is None:
         users[uid]["weeks"].pop(wk_iso, None)
-        await query.answer("✅ Selection removed")
     else:
-        data["weeks"].setdefault(wk_iso, {"Full week": [], "Half week": [], "Not really": []})
-        if uid not in data["weeks"][wk_iso].get(choice_key, []):
+        data.setdefault("weeks", {}).setdefault(wk_iso, {"Full week": [], "Half week": [], "Not really": []})
+        if uid not in data["weeks"][wk_iso].setdefault(choice_key, []):
             data["weeks"][wk_iso][choice_key].append(uid)
         users[uid]["weeks"][wk_iso] = choice_key
-        await query.answer(f"✅ {choice_key}")
 
-    save_json(settings.bounce_file, data)
 
-    # Update global message if exists
-    msg_id = load_json(settings.bounce_message_file).get("message_id")
-    text = format_bounceland_text(data)
-    try:
-        if msg_id:
-            await context.bot.edit_message_text(
-                chat_id=settings.chat_id,
-                message_id=msg_id,
-                text=text,
-                reply_markup=build_bounceland_keyboard(data, current_user=uid),
-                parse_mode="Markdown",
-            )
-    except Exception as e:
-        logging.warning(f"Bounceland edit failed: {e}")
+def _bounceland_user(query):
+    # use unique id as key if possible
+    uid = str(query.from_user.id)
+    name = query.from_user.first_name or ""
+    username = f"@{query.from_user.username}" if query.from_user.username else ""
+    return uid, name, username
+
+
+def bounceland_mode_action(poll, data, query, mode):
+    uid, name, username = _bounceland_user(query)
+    before = mode in data.get("users", {}).get(uid, {}).get("modes", [])
+    apply_bounceland_mode(data, uid, name, username, mode, not before)
+    event_log.record("MODE", uid, mode, before, not before, name=name, username=username)
+    return f"❌ {mode} removed" if before else f"✅ {mode} added"
+
+
+def bounceland_week_action(poll, data, query, arg):
+    uid, name, username = _bounceland_user(query)
+    wk_iso, choice_key = arg.split("|", 1)
+    prev_choice = data.get("users", {}).get(uid, {}).get("weeks", {}).get(wk_iso)
+    new_choice = None if prev_choice == choice_key else choice_key
+    apply_bounceland_week(data, uid, name, username, wk_iso, new_choice)
+    event_log.record("WEEK", uid, wk_iso, prev_choice, new_choice, name=name, username=username)
+    poll.page = bounceland_page_for_week(poll, data, wk_iso)
+    return "✅ Selection removed" if new_choice is None else f"✅ {choice_key}"
 
 
 async def handle_info(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -509,28 +911,126 @@ async def handle_info(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer("Choose Full / Half for this week.")
 
 
-async def post_bounceland_overview(app):
-    data = load_json(settings.bounce_file)
-    if not data:
-        data = init_bounceland_structure()
-        save_json(settings.bounce_file, data)
-    text = format_bounceland_text(data)
-    msg = await app.bot.send_message(
-    chat_id=settings.chat_id,
-    message_thread_id=settings.thread_id_bounceland,
-    text=text,
-    reply_markup=build_bounceland_keyboard(data),
-    parse_mode="Markdown"
-)
-    save_json(settings.bounce_message_file, {"message_id": msg.message_id})
-    logging.info(f"Bounceland Overview posted (id {msg.message_id})")
+# -----------------------------
+# Poll Registry
+# -----------------------------
+MEAL_POLL = register_poll(PollDef(
+    key="meal",
+    prefix="MEAL",
+    title="🍽 *Weekly Meal Participation*",
+    state_setting="meal_file",
+    message_setting="meal_message_file",
+    thread_setting="thread_id_meal",
+    init_state=lambda: init_toggle_state(MEAL_POLL),
+    format_text=format_toggle_text,
+    build_keyboard=build_toggle_keyboard,
+    actions={"MEAL": toggle_action},
+    thresholds=(25, 50),
+    options=meal_options,
+    voter=lambda query: query.from_user.first_name,
+    schedule=lambda: {"day_of_week": settings.meal_poll_day, "hour": settings.meal_poll_hour, "minute": settings.meal_poll_minute},
+    reset_on_post=True,
+))
+
+BOUNCELAND_POLL = register_poll(PollDef(
+    key="bounceland",
+    prefix="BOUNCE",
+    title="*Bounceland Weekly Summary*",
+    state_setting="bounce_file",
+    message_setting="bounce_message_file",
+    thread_setting="thread_id_bounceland",
+    init_state=init_bounceland_structure,
+    format_text=format_bounceland_text,
+    build_keyboard=build_bounceland_keyboard,
+    actions={"MODE": bounceland_mode_action, "WEEK": bounceland_week_action},
+    thresholds=(30, 50),
+    weights=dict(WEEK_CHOICES),  # "Not really" zählt 0
+    page_size=WEEKS_PER_PAGE,
+    page_keys=_bounceland_week_keys,
+))
+
+CALLBACK_HANDLERS["PAGE"] = handle_poll_page
+CALLBACK_HANDLERS["INFO"] = handle_info
+
+
+# -----------------------------
+# Permissions (Rollen + gecachte Chat-Admins)
+# -----------------------------
+class Permissions:
+    """
+    Rollen-Index: owner_id + admins aus der Config, optional ergänzt um die
+    Admins der Gruppe. getChatAdministrators wird höchstens alle
+    CHAT_ADMIN_TTL Sekunden abgefragt, nie pro Kommando.
+    """
+
+    def __init__(self):
+        self._static = {}
+        self._chat_admins = set()
+        self._chat_admins_expire = 0.0
+        self.rebuild()
+
+    def rebuild(self):
+        static = dict(settings.admins)
+        if settings.owner_id:
+            static[settings.owner_id] = "owner"
+        self._static = static
+        self._chat_admins_expire = 0.0
+
+    @property
+    def configured(self):
+        return bool(self._static or settings.chat_admin_role)
+
+    async def role_for(self, bot, user_id):
+        role = self._static.get(user_id)
+        if settings.chat_admin_role:
+            if time.monotonic() >= self._chat_admins_expire:
+                await self._refresh_chat_admins(bot)
+            if user_id in self._chat_admins and ROLE_LEVELS.get(settings.chat_admin_role, 0) > ROLE_LEVELS.get(role, 0):
+                role = settings.chat_admin_role
+        return role
+
+    async def allowed(self, bot, user_id, required):
+        # ohne jede Rollen-Config bleiben Kommandos offen (wie bisher ohne owner_id)
+        if not self.configured:
+            return True
+        role = await self.role_for(bot, user_id)
+        # unbekannte Rollen (Tippfehler in der Start-Config) geben keine Rechte
+        return ROLE_LEVELS.get(role, 0) >= ROLE_LEVELS[required]
+
+    async def _refresh_chat_admins(self, bot):
+        try:
+            members = await bot.get_chat_administrators(settings.chat_id)
+        except Exception as e:
+            # alten Stand behalten, später nochmal versuchen
+            logging.warning("Could not fetch chat administrators: %s", e)
+            self._chat_admins_expire = time.monotonic() + CHAT_ADMIN_RETRY
+            return
+        self._chat_admins = {m.user.id for m in members}
+        self._chat_admins_expire = time.monotonic() + CHAT_ADMIN_TTL
+
+
+permissions = Permissions()
+
+
+def require_role(role):
+    """Decorator für Kommandos: bricht ab, wenn der User die Rolle nicht hat."""
+    def decorator(handler):
+        @wraps(handler)
+        async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE):
+            if not await permissions.allowed(context.bot, update.effective_user.id, role):
+                await update.message.reply_text(f"⛔️ Only {role}s can do this.")
+                return
+            return await handler(update, context)
+        return wrapper
+    return decorator
 
 
 # -----------------------------
 # CSV Export (user_id,username,name,...weeks...)
 # -----------------------------
-def generate_bounceland_csv(path=settings.bounce_csv):
-    data = load_json(settings.bounce_file)
+def generate_bounceland_csv(path=settings.bounce_csv, data=None):
+    if data is None:
+        data = load_json(settings.bounce_file)
     if not data:
         data = init_bounceland_structure()
 
@@ -561,46 +1061,83 @@ def generate_bounceland_csv(path=settings.bounce_csv):
 
 async def cmd_export(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
-    logging.info(f"/export requested by {user_id}")
+    logging.info("/export requested by %s", user_id)
     csv_path = generate_bounceland_csv()
     try:
         with open(csv_path, "rb") as f:
             await context.bot.send_document(chat_id=settings.chat_id,
     message_thread_id=settings.thread_id_bounceland, document=f, filename=os.path.basename(csv_path))
     except Exception as e:
-        logging.error(f"Export failed: {e}")
+        logging.error("Export failed: %s", e)
         await update.message.reply_text("❌ Export failed.")
 
 # -----------------------------
 # Reset Command
 # -----------------------------
-async def cmd_reset(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user_id = update.effective_user.id
-    if settings.owner_id and user_id != settings.owner_id:
-        await update.message.reply_text("⛔️ Only the owner can do this.")
-        return
-
+def snapshot_and_swap_bounceland():
+    """
+    Friert den aktuellen Bounceland-State als versioniertes Archiv im
+    StateDirectory ein und ersetzt ihn durch einen frischen State.
+    Kein await dazwischen -> kein Klick landet zwischen Archiv und Swap.
+    Gibt (archive_path, snapshot) zurück.
+    """
+    snapshot = load_json(settings.bounce_file) or init_bounceland_structure()
+
+    archive_dir = os.path.dirname(os.path.abspath(settings.bounce_file))
+    prefix = "bounceland_archive_"
+    versions = [
+        int(name[len(prefix):].split("_", 1)[0])
+        for name in os.listdir(archive_dir)
+        if name.startswith(prefix) and name[len(prefix):].split("_", 1)[0].isdigit()
+    ]
+    version = max(versions, default=0) + 1
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    archive_path = os.path.join(archive_dir, f"{prefix}{version:03}_{stamp}.json")
+
+    save_json(archive_path, snapshot)
+    fresh = init_bounceland_structure()
+    save_json(settings.bounce_file, fresh)
+    BOUNCELAND_POLL.page = 0
+    event_log.record("BOUNCE_RESET", None, None, os.path.basename(archive_path), list(fresh["weeks"]))
+    return archive_path, snapshot
+
+
+async def send_archive_export(bot, chat_id, archive_path, snapshot):
+    """Export aus dem eingefrorenen Snapshot, läuft im Hintergrund nach dem Reset."""
+    csv_path = os.path.splitext(archive_path)[0] + ".csv"
     try:
-        # 1️⃣ Backup/Export vor Reset
-        csv_path = generate_bounceland_csv()
+        await asyncio.to_thread(generate_bounceland_csv, csv_path, snapshot)
         with open(csv_path, "rb") as f:
-            await context.bot.send_document(
-                chat_id=update.effective_chat.id,
+            await bot.send_document(
+                chat_id=chat_id,
                 document=f,
                 filename=os.path.basename(csv_path),
                 caption="📦 Automatic export before reset"
             )
+    except Exception as e:
+        logging.error("Export of %s failed: %s", archive_path, e)
+        await bot.send_message(chat_id=chat_id, text=f"❌ Export failed, data is kept in {os.path.basename(archive_path)}.")
 
-        # 2️⃣ Reset Bounceland data
-        data = init_bounceland_structure()
-        save_json(settings.bounce_file, data)
-
-        await update.message.reply_text("✅ Bounceland data has been deleted (backup sent).")
-        logging.info("⚠️ Bounceland JSON was cleared (after automatic backup).")
 
+@require_role("admin")
+async def cmd_reset(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    try:
+        # 1️⃣ Snapshot einfrieren + frischen State einsetzen
+        archive_path, snapshot = snapshot_and_swap_bounceland()
     except Exception as e:
-        logging.error(f"Reset failed: {e}")
+        logging.error("Reset failed: %s", e)
         await update.message.reply_text("❌ Error during reset.")
+        return
+
+    logging.info("⚠️ Bounceland JSON was reset (archived to %s).", archive_path)
+    await update.message.reply_text("✅ Bounceland data has been reset (archived, export follows).")
+    # Übersicht auf den leeren State neu zeichnen (alte Scores und ✅ weg)
+    request_render(BOUNCELAND_POLL, context, None)
+
+    # 2️⃣ Export aus dem Snapshot im Hintergrund
+    context.application.create_task(
+        send_archive_export(context.bot, update.effective_chat.id, archive_path, snapshot)
+    )
 
 # -----------------------------
 # CSV Import: only add new users (won't overwrite existing)
@@ -608,11 +1145,9 @@ async def cmd_reset(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 # We'll track import state per admin who initiated import
 # stored in bot_data['awaiting_import_from'] = user_id
+@require_role("admin")
 async def cmd_import(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
-    if settings.owner_id and user_id != settings.owner_id:
-        await update.message.reply_text("⛔️ Only the owner can do this.")
-        return
     # set awaiting flag
     context.application.bot_data["awaiting_import_from"] = user_id
     await context.bot.send_message(
@@ -732,6 +1267,7 @@ async def handle_document_for_import(update: Update, context: ContextTypes.DEFAU
             data["weeks"].setdefault(wk_iso, {"Full week": [], "Half week": [], "Not really": []})
             if uid not in data["weeks"][wk_iso].get(choice, []):
                 data["weeks"][wk_iso][choice].append(uid)
+        event_log.record("IMPORT", uid, None, None, data["users"][uid])
         added += 1
 
     save_json(settings.bounce_file, data)
@@ -745,21 +1281,171 @@ async def handle_document_for_import(update: Update, context: ContextTypes.DEFAU
 # -----------------------------
 # Callback Router
 # -----------------------------
+def is_duplicate_callback(query):
+    """
+    True für Telegram-Retries (gleiche callback_query.id) und Doppeltipps
+    (gleicher User + gleicher Button innerhalb CALLBACK_DEBOUNCE_SECONDS).
+    """
+    if query.id in SEEN_CALLBACKS:
+        return True
+    SEEN_CALLBACKS[query.id] = None
+    if len(SEEN_CALLBACKS) > CALLBACK_SEEN_MAX:
+        SEEN_CALLBACKS.popitem(last=False)
+
+    now = time.monotonic()
+    key = (query.from_user.id, query.data)
+    last = LAST_TAPS.pop(key, None)
+    LAST_TAPS[key] = now
+    if len(LAST_TAPS) > CALLBACK_SEEN_MAX:
+        LAST_TAPS.popitem(last=False)
+    return last is not None and now - last < CALLBACK_DEBOUNCE_SECONDS
+
+
 async def callback_router(update: Update, context: ContextTypes.DEFAULT_TYPE):
     qd = update.callback_query.data
     if not qd:
         await update.callback_query.answer()
         return
-    if qd.startswith("MEAL|"):
-        await handle_meal_button(update, context)
-    elif qd.startswith("MODE|"):
-        await handle_bounceland_mode(update, context)
-    elif qd.startswith("WEEK|"):
-        await handle_bounceland_week(update, context)
-    elif qd.startswith("INFO|"):
-        await handle_info(update, context)
-    else:
+    if is_duplicate_callback(update.callback_query):
+        await update.callback_query.answer()
+        return
+    handler = CALLBACK_HANDLERS.get(qd.split("|", 1)[0])
+    if handler is None:
         await update.callback_query.answer()
+        return
+
+    admission.check(context.application.update_queue.qsize())
+    started = time.monotonic()
+    try:
+        await handler(update, context)
+    finally:
+        admission.record(time.monotonic() - started)
+
+
+# -----------------------------
+# Update Offset (Restart ohne Doppelverarbeitung)
+# -----------------------------
+async def track_update_offset(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Läuft vor allen anderen Handlern (group -1). Verwirft Updates, die kurz
+    vor einem harten Abbruch schon verarbeitet, aber noch nicht bei Telegram
+    bestätigt waren. Telegram vergibt update_ids nach einer Woche Pause
+    zufällig neu, deshalb gilt nur ein kleines Fenster unter der letzten id
+    als Duplikat; alles andere wird normal verarbeitet.
+    """
+    global LAST_UPDATE_ID
+    if 0 <= LAST_UPDATE_ID - update.update_id < UPDATE_ID_WINDOW:
+        logging.info("Skipping already processed update %s", update.update_id)
+        raise ApplicationHandlerStop
+    LAST_UPDATE_ID = update.update_id
+
+
+def save_update_offset():
+    if LAST_UPDATE_ID:
+        save_json(settings.offset_file, {"last_update_id": LAST_UPDATE_ID})
+
+
+# -----------------------------
+# Replay (State aus Event Log neu aufbauen)
+# -----------------------------
+def poll_checkpoint():
+    """Kompletter State aller Polls für CHECKPOINT-Events."""
+    return {key: load_poll_state(poll) for key, poll in POLLS.items()}
+
+
+def replay_events(paths):
+    """
+    Baut den State aller Polls aus den Event-Logs (älteste zuerst) neu auf.
+    Startpunkt ist der erste CHECKPOINT; fehlt er am Anfang, wird gewarnt,
+    weil das Ergebnis dann unvollständig sein kann.
+    Es wird immer der after-Wert gesetzt, doppelte Events sind also harmlos.
+    """
+    toggle_polls = {poll.prefix: poll for poll in POLLS.values() if poll.options}
+    states = {poll.key: {"polls": {}} for poll in toggle_polls.values()}
+    bounce = {"users": {}, "weeks": {}}
+    first = True
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                ev = json.loads(line)
+                kind = ev["type"]
+                if first and kind != "CHECKPOINT":
+                    logging.warning("%s does not start with a CHECKPOINT, replayed state may be incomplete", path)
+                first = False
+                if kind == "CHECKPOINT":
+                    for poll in toggle_polls.values():
+                        states[poll.key] = ev["after"].get(poll.key, {"polls": {}})
+                    bounce = ev["after"].get(BOUNCELAND_POLL.key, {"users": {}, "weeks": {}})
+                elif kind in toggle_polls:
+                    apply_toggle_vote(states[toggle_polls[kind].key]["polls"], ev["name"], ev["key"], ev["after"])
+                elif kind.endswith("_NEW") and kind[:-4] in toggle_polls:
+                    states[toggle_polls[kind[:-4]].key] = {"polls": {option: [] for option in ev["after"]}}
+                elif kind == "MODE":
+                    apply_bounceland_mode(bounce, ev["uid"], ev.get("name", ""), ev.get("username", ""), ev["key"], ev["after"])
+                elif kind == "WEEK":
+                    apply_bounceland_week(bounce, ev["uid"], ev.get("name", ""), ev.get("username", ""), ev["key"], ev["after"])
+                elif kind == "BOUNCE_RESET":
+                    bounce = {"users": {}, "weeks": {wk: {"Full week": [], "Half week": [], "Not really": []} for wk in ev["after"]}}
+                elif kind == "IMPORT":
+                    bounce["users"][ev["uid"]] = ev["after"]
+                    for wk_iso, choice in ev["after"].get("weeks", {}).items():
+                        groups = bounce["weeks"].setdefault(wk_iso, {"Full week": [], "Half week": [], "Not really": []})
+                        if ev["uid"] not in groups.setdefault(choice, []):
+                            groups[choice].append(ev["uid"])
+    states[BOUNCELAND_POLL.key] = bounce
+    return states
+
+
+def cmd_replay(argv):
+    """python bot.py replay [LOGFILE ...] -> rekonstruierter State als JSON auf stdout."""
+    paths = argv or event_log_files(settings.event_log_file)
+    json.dump(replay_events(paths), sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write("\n")
+
+
+# -----------------------------
+# Config Reload (SIGHUP)
+# -----------------------------
+async def post_poll_job(poll, app):
+    # Als Application-Task starten: APScheduler bricht laufende Jobs beim
+    # shutdown() ab, app.stop() dagegen wartet auf create_task-Tasks.
+    app.create_task(post_poll(poll, app))
+
+
+def schedule_polls(scheduler, app):
+    for poll in POLLS.values():
+        if poll.schedule:
+            scheduler.add_job(
+                post_poll_job, trigger="cron", id=poll.key, replace_existing=True, args=[poll, app],
+                timezone=settings.scheduler_timezone, **poll.schedule()
+            )
+
+
+def reload_settings(scheduler, app):
+    """
+    Liest CONFIG_FILE + SETTINGS_FILE neu (SIGHUP bzw. systemctl reload).
+    Ungültige Config wird verworfen, die laufende bleibt aktiv. Settings
+    werden in-place aktualisiert, Jobs neu registriert.
+    CONFIG_FILE ist im NixOS-Modul eine LoadCredential-Kopie und ändert sich
+    erst beim Restart; live änderbar ist SETTINGS_FILE.
+    """
+    try:
+        new = load_settings()
+        validate_settings(new)
+        if new.telegram_bot_token != settings.telegram_bot_token:
+            raise ValueError("telegram_bot_token changes need a restart")
+    except Exception as e:
+        logging.error("Config reload rejected, keeping current config: %s", e)
+        return False
+
+    for f in fields(Settings):
+        setattr(settings, f.name, getattr(new, f.name))
+    permissions.rebuild()
+    schedule_polls(scheduler, app)
+    logging.info("🔄 Config reloaded")
+    return True
 
 
 # -----------------------------
@@ -768,30 +1454,27 @@ async def callback_router(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def heartbeat():
     while True:
         logging.info("💓 Bot alive - waiting for commands...")
+        if admission.degraded:
+            logging.info("Degraded mode active, %s re-renders shed so far", admission.shed)
+        save_update_offset()
         await asyncio.sleep(60)
 
 
 # -----------------------------
 # Commands
 # -----------------------------
+@require_role("poster")
 async def cmd_postnow_meal(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user_id = update.effective_user.id
-    if settings.owner_id and user_id != settings.owner_id:
-        await update.message.reply_text("⛔️ Only the owner can do this.")
-        return
-    await post_weekly_meal(context.application)
+    await post_poll(MEAL_POLL, context.application)
     await context.bot.send_message(
     chat_id=settings.chat_id,
     message_thread_id=settings.thread_id_bounceland,
     text="✅ New weekly poll posted.")
 
 
+@require_role("poster")
 async def cmd_bounceland(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user_id = update.effective_user.id
-    if settings.owner_id and user_id != settings.owner_id:
-        await update.message.reply_text("⛔️ Only the owner can do this.")
-        return
-    await post_bounceland_overview(context.application)
+    await post_poll(BOUNCELAND_POLL, context.application)
     await context.bot.send_message(
     chat_id=settings.chat_id,
     message_thread_id=settings.thread_id_bounceland,
@@ -802,11 +1485,14 @@ async def cmd_bounceland(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # Main
 # -----------------------------
 async def main():
+    global LAST_UPDATE_ID
     # ensure files
     _ensure_file(settings.meal_file, {"polls": {}})
     _ensure_file(settings.meal_message_file, {})
     _ensure_file(settings.bounce_file, init_bounceland_structure())
     _ensure_file(settings.bounce_message_file, {})
+    LAST_UPDATE_ID = load_json(settings.offset_file).get("last_update_id", 0)
+    event_log.record_checkpoint()
 
     if not settings.telegram_bot_token:
         logging.error("TELEGRAM_BOT_TOKEN NOT SET, exiting...")
@@ -814,6 +1500,7 @@ async def main():
     app = ApplicationBuilder().token(settings.telegram_bot_token).build()
 
     # Handlers
+    app.add_handler(TypeHandler(Update, track_update_offset), group=-1)
     app.add_handler(CallbackQueryHandler(callback_router))
     app.add_handler(CommandHandler("postnow", cmd_postnow_meal))
     app.add_handler(CommandHandler("bounceland", cmd_bounceland))
@@ -824,23 +1511,54 @@ async def main():
     # Document handler for CSV import (only accepted after /import)
     app.add_handler(MessageHandler(filters.Document.ALL, handle_document_for_import))
 
-    # scheduler: weekly meal (Saturday 18:00 Europe/Berlin)
+    # scheduler: z.B. weekly meal (Saturday 18:00 Europe/Berlin)
     scheduler = AsyncIOScheduler(timezone=settings.scheduler_timezone)
-    scheduler.add_job(post_weekly_meal, trigger="cron", day_of_week=settings.meal_poll_day, hour=settings.meal_poll_hour, minute=settings.meal_poll_minute, args=[app])
+    schedule_polls(scheduler, app)
     scheduler.start()
 
+    # SIGTERM (systemd restart) / SIGINT -> sauber herunterfahren
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop_event.set)
+    loop.add_signal_handler(signal.SIGHUP, reload_settings, scheduler, app)
+
     await app.initialize()
     await app.start()
 
     try:
         await app.bot.send_message(chat_id=settings.chat_id, text="🤖 Bot started! Commands: /postnow (meal), /bounceland, /export, /import")
     except Exception as e:
-        logging.warning(f"Could not send start message: {e}")
+        logging.warning("Could not send start message: %s", e)
 
     logging.info("✅ Bot running (Polling mode)")
-    # Run heartbeat and polling
-    await asyncio.gather(heartbeat(), app.updater.start_polling())
+    # Run heartbeat and polling until a stop signal arrives
+    await app.updater.start_polling()
+    heartbeat_task = asyncio.create_task(heartbeat())
+    admission_task = asyncio.create_task(admission.run(app))
+    event_log_task = asyncio.create_task(event_log.run())
+    await stop_event.wait()
+
+    logging.info("🛑 Stop signal received, shutting down...")
+    heartbeat_task.cancel()
+    admission_task.cancel()
+    # 1. keine neuen Updates mehr annehmen
+    await app.updater.stop()
+    # 2. keine neuen Jobs starten (laufende post_poll sind Application-Tasks)
+    scheduler.pause()
+    scheduler.shutdown(wait=False)
+    # 3. wartende Updates/Edits und post_poll-Tasks abarbeiten
+    await app.stop()
+    # 4. Zustand sichern
+    save_update_offset()
+    event_log.stop()
+    await event_log_task
+    await app.shutdown()
+    logging.info("✅ Bot stopped (last update id %s)", LAST_UPDATE_ID)
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    if sys.argv[1:2] == ["replay"]:
+        cmd_replay(sys.argv[2:])
+    else:
+        asyncio.run(main())
@@ -2,7 +2,9 @@
   description = "bounceland telegram bot joshi";
 
   outputs = { ... } : {
-    nixosModules.default = {config, lib, pkgs, ...}: {
+    nixosModules.default = {config, lib, pkgs, ...}: let
+      settingsJson = builtins.toJSON config.services.joshibot.settings;
+    in {
       options.services.joshibot = {
         enable = lib.mkEnableOption "Enable joshibot service";
 
@@ -10,13 +12,29 @@
           type = lib.types.str;
           description = "the path to the environment file";
         };
+
+        settings = lib.mkOption {
+          type = lib.types.attrs;
+          default = {};
+          example = { update_interval = 5; thread_id_meal = 42; };
+          description = ''
+            Non-secret settings that override configFile (update_interval,
+            thread ids, owner_id, admins, meal poll schedule, ...).
+            Changing them reloads the bot instead of restarting it.
+          '';
+        };
       };
 
       config = lib.mkIf config.services.joshibot.enable {
+        # fester Pfad (Symlink wird bei switch umgehängt), damit SIGHUP den neuen Stand liest
+        environment.etc."joshibot/settings.json".text = settingsJson;
+
         systemd.services.joshibot = {
           description = "Joshibot Webserver";
           wantedBy = ["multi-user.target"];
           after = ["network.target"];
+          # Änderungen an settings -> systemctl reload statt Restart
+          reloadTriggers = [ settingsJson ];
           serviceConfig = let 
             python = pkgs.python3.withPackages (ps: with ps; [
               python-telegram-bot
@@ -24,6 +42,8 @@
             ]);
           in {
             ExecStart = "${python}/bin/python ${ ./bot.py }";
+            # SIGHUP liest SETTINGS_FILE (und CONFIG_FILE) neu; die LoadCredential-Kopie wird nur beim Start gefüllt
+            ExecReload = "${pkgs.coreutils}/bin/kill -HUP $MAINPID";
             Restart = "always";
             Type = "simple";
             DynamicUser = "yes";
@@ -33,12 +53,15 @@
             ];
             Environment = [
               "CONFIG_FILE=/run/credentials/%n/config.json"
+              "SETTINGS_FILE=/etc/joshibot/settings.json"
 
               "MEAL_FILE=/var/lib/joshibot/polls_meal.json"
               "MEAL_MESSAGE_FILE=/var/lib/joshibot/meal_message_id.json"
               "BOUNCE_FILE=/var/lib/joshibot/bounceland.json"
               "BOUNCE_MESSAGE_FILE=/var/lib/joshibot/bounceland_message_id.json"
               "BOUNCE_CSV=/var/lib/joshibot/bounceland_data.csv"
+              "OFFSET_FILE=/var/lib/joshibot/update_offset.json"
+              "EVENT_LOG_FILE=/var/lib/joshibot/events.jsonl"
             ];
           };
         };